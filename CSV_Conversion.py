@@ -1,12 +1,89 @@
 import pyodbc
 import pandas as pd
 import os
+import csv
+import decimal
+import queue
+import contextlib
+import atexit
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 # --- Configuration (UPDATE THESE) ---
 # Use the full path to your IPEDS ACCDB file
 ACCD_FILE = r"C:\Users\amatu\Downloads\IPEDS_2022-23_Final\IPEDS202223.accdb" 
 # Use a directory where you want all the CSV files to be saved
 OUTPUT_DIR = r"C:\Users\amatu\Downloads\Phase_3" 
+# Number of rows pulled from the ODBC driver per fetch round-trip
+FETCH_ARRAYSIZE = 10000
+# Number of tables exported concurrently (one pooled ODBC connection per worker)
+EXPORT_WORKERS = 4
+# Seconds to wait when opening an ODBC connection
+CONNECT_TIMEOUT = 60
+# --- Connection Pool ---
+# Opening an Access DBQ costs hundreds of ms, so connections are pooled per connection
+# string and reused across calls, then closed when the interpreter exits.
+_POOL_CACHE = {}
+_CACHE_LOCK = threading.Lock()
+
+def _connect(conn_str):
+    return pyodbc.connect(conn_str, autocommit=True, timeout=CONNECT_TIMEOUT)
+
+def _get_pool(conn_str, size):
+    """Returns a queue holding at least `size` open connections for conn_str."""
+    with _CACHE_LOCK:
+        pool = _POOL_CACHE.setdefault(conn_str, queue.Queue())
+
+        # Drop connections that were closed since the last call, then top the pool up.
+        # Live connections go back on the queue even if opening a new one fails.
+        live_conns = []
+        try:
+            while not pool.empty():
+                conn = pool.get_nowait()
+                if not conn.closed:
+                    live_conns.append(conn)
+            while len(live_conns) < size:
+                live_conns.append(_connect(conn_str))
+        finally:
+            for conn in live_conns:
+                pool.put(conn)
+        return pool
+
+@contextlib.contextmanager
+def _borrow_conn(pool, conn_str):
+    """
+    Borrows a connection from the pool and always returns it. A closed connection is
+    reopened before use, and one that raised a connection-level error is closed so it is
+    never handed out again in a broken state (plain SQL errors keep the connection).
+    """
+    conn = pool.get()
+    try:
+        if conn.closed:
+            conn = _connect(conn_str)
+        yield conn
+    except (pyodbc.OperationalError, pyodbc.InterfaceError):
+        try:
+            conn.close()
+        except pyodbc.Error:
+            pass
+        raise
+    finally:
+        pool.put(conn)
+
+@atexit.register
+def _close_cached_conns():
+    conns = []
+    for pool in _POOL_CACHE.values():
+        while not pool.empty():
+            conns.append(pool.get_nowait())
+
+    for conn in conns:
+        try:
+            if not conn.closed:
+                conn.close()
+        except pyodbc.Error:
+            pass
+
 # --- Function Definitions ---
 
 def get_table_names(conn):
@@ -25,10 +102,45 @@ def get_table_names(conn):
     print(f"Found {len(table_list)} tables to export.")
     return table_list
 
-def accdb_to_csv_multiple_tables(accdb_path, output_directory):
+def fetch_table(conn, sql_query):
+    """
+    Executes a query on a raw pyodbc cursor and builds the DataFrame column-wise,
+    bypassing pd.read_sql's per-row conversion and SQL introspection overhead.
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute(sql_query)
+        columns = [col[0] for col in cursor.description]
+        # Access Currency/Decimal columns come back as Decimal; pd.read_sql coerced them to float
+        decimal_columns = {col[0] for col in cursor.description if col[1] is decimal.Decimal}
+
+        # Pull rows in large batches rather than one driver round-trip per row
+        rows = []
+        while True:
+            batch = cursor.fetchmany(FETCH_ARRAYSIZE)
+            if not batch:
+                break
+            rows.extend(batch)
+    finally:
+        cursor.close()
+
+    # Transpose rows into columns once so pandas infers each column's dtype directly
+    if not rows:
+        return pd.DataFrame(columns=columns)
+
+    column_data = {}
+    for name, values in zip(columns, zip(*rows)):
+        if name in decimal_columns:
+            column_data[name] = [None if value is None else float(value) for value in values]
+        else:
+            column_data[name] = list(values)
+    return pd.DataFrame(column_data, columns=columns)
+
+def accdb_to_csv_multiple_tables(accdb_path, output_directory, max_workers=EXPORT_WORKERS):
     """
     Connects to an Access .accdb file, reads all user tables, and saves each 
-    one to a separate CSV file in the specified directory.
+    one to a separate CSV file in the specified directory. Tables are exported
+    concurrently by up to max_workers threads using pooled connections.
     """
     # 1. Construct the connection string
     conn_str = (
@@ -44,45 +156,64 @@ def accdb_to_csv_multiple_tables(accdb_path, output_directory):
     os.makedirs(output_directory, exist_ok=True)
 
     try:
-        # 2. Establish database connection
+        # 2. Establish (or reuse) the pooled database connections
+        # Workers borrow connections from the pool; Access allows concurrent readers
         print(f"Connecting to the database: {accdb_path}")
-        conn = pyodbc.connect(conn_str)
+        conn_pool = _get_pool(conn_str, max_workers)
 
         # 3. Get all table names
-        tables_to_export = get_table_names(conn)
+        with _borrow_conn(conn_pool, conn_str) as conn:
+            tables_to_export = get_table_names(conn)
         
         total_tables = len(tables_to_export)
         exported_count = 0
+        progress_lock = threading.Lock()
 
-        # 4. Iterate and export each table
-        for table_name in tables_to_export:
-            exported_count += 1
-            print("-" * 50)
-            print(f"({exported_count}/{total_tables}) Exporting table: **{table_name}**")
-            
+        def report_progress(lines):
+            # Count and print each table's result in one locked block when it finishes,
+            # so output from concurrent workers doesn't interleave
+            nonlocal exported_count
+            with progress_lock:
+                exported_count += 1
+                print("-" * 50)
+                for line in lines(exported_count):
+                    print(line)
+
+        def export_one(table_name):
             # Define the output CSV path for the current table
             output_csv_path = os.path.join(output_directory, f"{table_name}.csv")
             
             try:
                 # Read data directly into a Pandas DataFrame
                 sql_query = f'SELECT * FROM [{table_name}]'
-                print(f"   -> Executing SQL: {sql_query}")
-                df = pd.read_sql(sql_query, conn)
+                with _borrow_conn(conn_pool, conn_str) as worker_conn:
+                    df = fetch_table(worker_conn, sql_query)
                 
                 # Save the DataFrame as a CSV file
                 # index=False is crucial to avoid adding an unnecessary index column
-                df.to_csv(output_csv_path, index=False, encoding='utf-8') 
+                df.to_csv(output_csv_path, index=False, encoding='utf-8', quoting=csv.QUOTE_MINIMAL)
                 
-                print(f"   -> Success: Saved {len(df)} rows to {os.path.basename(output_csv_path)}")
+                row_count = len(df)
+                report_progress(lambda n: [
+                    f"({n}/{total_tables}) Exported table: **{table_name}**",
+                    f"   -> Executed SQL: {sql_query}",
+                    f"   -> Success: Saved {row_count} rows to {os.path.basename(output_csv_path)}"
+                ])
                 
                 # Explicitly delete DataFrame to free memory immediately after use
                 del df 
                 
             except Exception as table_e:
-                print(f"   -> **Error** exporting table {table_name}: {table_e}")
+                report_progress(lambda n: [
+                    f"({n}/{total_tables}) Failed table: **{table_name}**",
+                    f"   -> **Error** exporting table {table_name}: {table_e}"
+                ])
+
+        # 4. Export tables in parallel so one table's fetch overlaps another's CSV write
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            list(executor.map(export_one, tables_to_export))
                 
-        # 5. Close the database connection
-        conn.close()
+        # 5. Connections stay cached for later calls and are closed at interpreter exit
         print("\n" + "=" * 50)
         print("✅ Conversion process complete.")
         print(f"All tables exported to: {OUTPUT_DIR}")
@@ -1,13 +1,27 @@
 import pandas as pd
 import numpy as np
 import os
+import hashlib
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
 import plotly.graph_objects as go
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Any, Tuple
 
+# Copy-on-Write: selections and column assignments share memory until they are written to.
+# It is always on from pandas 3.0, where the option is deprecated, so only opt in on older versions.
+if int(pd.__version__.split('.')[0]) < 3:
+    pd.options.mode.copy_on_write = True
+
 # --- 1. CONFIGURATION ---
 # IMPORTANT: Replace this with the actual path to your unzipped IPEDS files.
 IPEDS_BASE_PATH = r"C:\Users\amatu\Downloads\Phase_3"
 OUTPUT_FILE = "final_merit_college_rankings.csv"
+# Parsed CSVs are cached next to the source as <file>.csv.parquet and reused until the CSV changes
+PARQUET_CACHE_SUFFIX = ".parquet"
+# Parquet metadata key holding a fingerprint of the source CSV and parse settings the cache was built with
+CACHE_TAG_KEY = b"ipeds_parse_settings"
 
 # List of ESSENTIAL FILES for the Merit Aid model: (8 files)
 ESSENTIAL_FILES = {
@@ -21,36 +35,146 @@ ESSENTIAL_FILES = {
     'mission': 'IC2022Mission.csv'  
 }
 
+# Columns actually used downstream from each file (everything else is skipped at parse time)
+NEEDED_COLS = {
+    'hd': ['UNITID', 'INSTNM', 'CONTROL', 'ICLEVEL', 'HDEGOFR1'],
+    'sfa_p1': ['UNITID', 'IGRNT_A'],
+    'sfa_p2': ['UNITID', 'NPT442'],
+    'ic': ['UNITID', 'TUITION2'],
+    'adm_sat': ['UNITID', 'SATVR75', 'SATMT75'],
+    'adm_rate': ['UNITID', 'DVADM01'],
+    'gr': ['UNITID', 'GBA4RTT'],
+    'mission': ['unitid', 'mission']
+}
+
+# Narrow column types: IDs, codes, dollars and rates all fit in 8/32-bit types
+DTYPES = {
+    'UNITID': pa.int32(),
+    'unitid': pa.int32(),
+    'CONTROL': pa.int8(),
+    'ICLEVEL': pa.int8(),
+    'HDEGOFR1': pa.int8(),
+    'TUITION2': pa.float32(),
+    'IGRNT_A': pa.float32(),
+    'NPT442': pa.float32(),
+    'SATVR75': pa.float32(),
+    'SATMT75': pa.float32(),
+    'DVADM01': pa.float32(),
+    'GBA4RTT': pa.float32()
+}
+
+# Integer columns become nullable pandas types so missing values don't promote them to float64
+PANDAS_TYPES = {
+    pa.int8(): pd.Int8Dtype(),
+    pa.int32(): pd.Int32Dtype()
+}
+
+# Standard IPEDS Missing/Special Values (e.g., -1, -2, -9), converted to nulls while parsing
+DEFAULT_NULL_VALUES = ['', 'NA', 'N/A', 'NULL', 'NaN', 'nan']
+IPEDS_SPECIAL_VALUES = ['-1', '-2', '-9', '-1.0', '-2.0', '-9.0']
+SPECIAL_VALUE_TABLES = {'sfa_p1', 'sfa_p2', 'ic', 'adm_sat', 'adm_rate', 'gr'}
+
 # --- 2. ETL STAGE: EXTRACTION & INITIAL FILTERING ---
 
 def load_and_clean_data(base_path: str, files_map: Dict[str, str]) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame] | None:
     """Loads necessary IPEDS tables, cleans special values, and filters for 4-year degree-granting colleges."""
 
     data: Dict[str, pd.DataFrame] = {}
-    
-    # 2.1 Load Core Tables
-    for key, filename in files_map.items():
+
+    def read_table(key: str, filename: str) -> pd.DataFrame:
+        csv_path = os.path.join(base_path, filename)
+        cache_path = csv_path + PARQUET_CACHE_SUFFIX
+
+        null_values = DEFAULT_NULL_VALUES
+        if key in SPECIAL_VALUE_TABLES:
+            null_values = DEFAULT_NULL_VALUES + IPEDS_SPECIAL_VALUES
+
+        # Fingerprint of the source file and the parse settings; the cache is only reused on an
+        # exact match (unzipped IPEDS releases keep the archive's older mtimes, so newer-than isn't enough)
+        csv_stat = os.stat(csv_path)
+        cache_tag = hashlib.sha1(repr((
+            csv_stat.st_size,
+            csv_stat.st_mtime_ns,
+            NEEDED_COLS[key],
+            [str(DTYPES.get(col)) for col in NEEDED_COLS[key]],
+            null_values
+        )).encode('utf-8')).hexdigest().encode('ascii')
+
+        if os.path.exists(cache_path):
+            try:
+                if (pq.read_schema(cache_path).metadata or {}).get(CACHE_TAG_KEY) == cache_tag:
+                    table = pq.read_table(cache_path, columns=NEEDED_COLS[key])
+                    return table.to_pandas(types_mapper=PANDAS_TYPES.get)
+                print(f"Note: Parquet cache for {filename} does not match the current CSV or parse settings. Re-parsing the CSV.")
+            except (pa.ArrowException, OSError, KeyError):
+                pass  # Unreadable cache; re-parse the CSV
+
         try:
-            data[key] = pd.read_csv(os.path.join(base_path, filename), encoding='latin-1', low_memory=False)
-        except FileNotFoundError as e:
-            print(f"Error: Required file not found: {filename}. Please ensure this file exists in the directory.")
-            return None
+            table = pacsv.read_csv(
+                csv_path,
+                read_options=pacsv.ReadOptions(encoding='latin-1'),
+                convert_options=pacsv.ConvertOptions(
+                    include_columns=NEEDED_COLS[key],
+                    column_types={col: DTYPES[col] for col in NEEDED_COLS[key] if col in DTYPES},
+                    null_values=null_values,
+                    strings_can_be_null=True
+                )
+            )
+        except pa.ArrowInvalid as e:
+            # Values Arrow won't coerce (e.g., '1.0' in an integer column, which the exporter writes
+            # for Access integer columns containing NULLs): re-parse with the pandas C engine,
+            # then apply the same column types
+            print(f"Warning: Arrow could not parse {filename} ({e}). Falling back to the pandas C parser.")
+            df = pd.read_csv(
+                csv_path,
+                encoding='latin-1',
+                usecols=NEEDED_COLS[key],
+                na_values=null_values,
+                keep_default_na=False
+            )
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            table = table.cast(pa.schema([
+                pa.field(field.name, DTYPES.get(field.name, field.type)) for field in table.schema
+            ]))
 
-    # 2.2 Standard IPEDS Missing/Special Value Handling (e.g., -1, -2, -9)
-    for df_name in ['sfa_p1', 'sfa_p2', 'ic', 'adm_sat', 'adm_rate', 'gr']:
-        if df_name in data:
-            data[df_name].replace([-1, -2, -9], np.nan, inplace=True)
+        try:
+            metadata = {**(table.schema.metadata or {}), CACHE_TAG_KEY: cache_tag}
+            pq.write_table(table.replace_schema_metadata(metadata), cache_path, compression='zstd')
+        except OSError as e:
+            print(f"Warning: Could not write parquet cache for {filename}: {e}")
+
+        return table.to_pandas(types_mapper=PANDAS_TYPES.get)
+
+    # 2.1 Load Core Tables (only the needed columns, files parsed concurrently)
+    # 2.2 IPEDS special values are mapped to NaN by the parser via null_values
+    with ThreadPoolExecutor() as executor:
+        futures = {key: executor.submit(read_table, key, filename) for key, filename in files_map.items()}
+
+        for key, future in futures.items():
+            try:
+                data[key] = future.result()
+            except FileNotFoundError as e:
+                print(f"Error: Required file not found: {files_map[key]}. Please ensure this file exists in the directory.")
+                return None
+            except KeyError as e:
+                print(f"Error: {files_map[key]} is missing a required column ({e}). Expected columns: {NEEDED_COLS[key]}.")
+                return None
 
     # 2.3 Initial Filtering: Target 4-year, degree-granting institutions
     hd = data['hd']
     
     # Use column 'HDEGOFR1' for Highest Degree Offered
     try:
-        hd_filtered = hd[
-            (hd['ICLEVEL'] == 1) &          
-            (hd['HDEGOFR1'] >= 3) &           
-            (hd['UNITID'].notna())
-        ][['UNITID', 'INSTNM', 'CONTROL']]
+        # Build the row mask on plain numpy arrays (missing codes map to 0, which fails both tests)
+        iclevel = hd['ICLEVEL'].to_numpy(dtype=np.int8, na_value=0)
+        highest_degree = hd['HDEGOFR1'].to_numpy(dtype=np.int8, na_value=0)
+        has_unitid = hd['UNITID'].notna().to_numpy()
+        mask = (iclevel == 1) & (highest_degree >= 3) & has_unitid
+
+        hd_filtered = hd.loc[mask, ['UNITID', 'INSTNM', 'CONTROL']]
+
+        # CONTROL has only a handful of codes; a categorical is cheaper to carry through the joins
+        hd_filtered = hd_filtered.astype({'CONTROL': 'category'})
         
         print(f"Successfully used 'HDEGOFR1' to filter for 4-year degree-granting institutions.")
         
@@ -68,11 +192,14 @@ def calculate_metrics(hd, sfa_p1, sfa_p2, ic, adm_sat, adm_rate, gr, mission):
     """Joins dataframes and calculates the Merit Generosity Index (MGI)."""
 
     # 3.1 Combine SFA data (P1 and P2)
-    sfa_data_merged = sfa_p1[['UNITID', 'IGRNT_A']].merge(
-        sfa_p2[['UNITID', 'NPT442']], 
-        on='UNITID',
-        how='inner'
-    )
+    # UNITID is unique per survey file, so the inner join is just an index intersection
+    sfa_grant = sfa_p1.set_index('UNITID')['IGRNT_A']
+    sfa_net_price = sfa_p2.set_index('UNITID')['NPT442']
+    common_ids = sfa_grant.index.intersection(sfa_net_price.index)
+    sfa_data_merged = pd.DataFrame({
+        'IGRNT_A': sfa_grant.loc[common_ids].to_numpy(),
+        'NPT442': sfa_net_price.loc[common_ids].to_numpy()
+    }, index=common_ids)
     
     # 3.2 Combine Admissions Data 
     try:
@@ -103,79 +230,114 @@ def calculate_metrics(hd, sfa_p1, sfa_p2, ic, adm_sat, adm_rate, gr, mission):
     # FIX: Use confirmed column 'mission' and rename 'unitid' to 'UNITID'
     try:
         mission_data = mission[['unitid', 'mission']].rename(columns={'unitid': 'UNITID'}) # <--- FIX APPLIED HERE
+        # Long free-text column: keep it Arrow-backed instead of Python string objects
+        mission_data = mission_data.astype({'mission': 'string[pyarrow]'})
     except KeyError as e:
         print(f"\n--- CRITICAL MISSION ERROR ---")
         print(f"KeyError: Missing required column {e}. IC2022Mission.csv must contain 'unitid' and 'mission'.")
         return pd.DataFrame() 
 
     # 3.4 Merge All Tables (HD -> IC -> SFA -> ADM -> GR -> MISSION)
-    merged_df = hd.merge(ic_data, on='UNITID', how='left')
-    merged_df = merged_df.merge(sfa_data_merged, on='UNITID', how='left')
-    merged_df = merged_df.merge(adm_data_merged, on='UNITID', how='left') 
-    merged_df = merged_df.merge(gr_data, on='UNITID', how='left')
-    merged_df = merged_df.merge(mission_data, on='UNITID', how='left')
+    # A single multi-way join on the UNITID index instead of five chained merges
+    merged_df = hd.set_index('UNITID').join([
+        ic_data.set_index('UNITID'),
+        sfa_data_merged,
+        adm_data_merged.set_index('UNITID'),
+        gr_data.set_index('UNITID'),
+        mission_data.set_index('UNITID')
+    ], how='left').reset_index()
 
     # Drop rows where essential financial data is missing
-    merged_df.dropna(subset=['TUITION2', 'IGRNT_A', 'NPT442'], inplace=True)
+    merged_df = merged_df.dropna(subset=['TUITION2', 'IGRNT_A', 'NPT442'])
     
     # 3.5 Core Metric Calculation: Merit Generosity Index (MGI)
-    merged_df['MGI'] = merged_df['IGRNT_A'] / merged_df['TUITION2']
+    # 3.6 Affordability Score: Net Price % of Tuition (Low is better)
+    # Inputs are stored as float32; the metrics are computed in float64 for full precision
+    tuition = merged_df['TUITION2'].to_numpy(dtype=np.float64)
+    merged_df['MGI'] = merged_df['IGRNT_A'].to_numpy(dtype=np.float64) / tuition
+    merged_df['NET_PRICE_RATIO'] = merged_df['NPT442'].to_numpy(dtype=np.float64) / tuition
     
     # Fill NaN values in 'GBA4RTT' (Graduation Rate) with the median for ranking stability
-    merged_df['GBA4RTT'].fillna(merged_df['GBA4RTT'].median(), inplace=True)
-    
-    # 3.6 Affordability Score: Net Price % of Tuition (Low is better)
-    merged_df['NET_PRICE_RATIO'] = merged_df['NPT442'] / merged_df['TUITION2']
+    grad_rate = merged_df['GBA4RTT'].to_numpy(copy=True)
+    np.copyto(grad_rate, np.nanmedian(grad_rate), where=np.isnan(grad_rate))
+    merged_df['GBA4RTT'] = grad_rate
 
     # Rename for readability
-    merged_df.rename(columns={
+    merged_df = merged_df.rename(columns={
         'TUITION2': 'Sticker_Price',
         'IGRNT_A': 'Avg_Inst_Grant',
         'NPT442': 'Net_Price_MidClass', 
         'GBA4RTT': 'Graduation_Rate_4yr',
         'DVADM01': 'Admissions_Rate',
         'mission': 'MISSION' # Renaming 'mission' to 'MISSION' for output consistency
-    }, inplace=True)
+    })
     
     # Final data type clean up (Grad Rate/Admissions Rate are percentages, convert to 0-1 scale)
-    merged_df['Graduation_Rate_4yr'] = merged_df['Graduation_Rate_4yr'] / 100 
-    merged_df['Admissions_Rate'] = merged_df['Admissions_Rate'] / 100
+    # Scale both columns in one operation on an owned float64 copy (to_numpy views are read-only under CoW)
+    rate_cols = ['Graduation_Rate_4yr', 'Admissions_Rate']
+    rates = merged_df[rate_cols].to_numpy(dtype=np.float64, copy=True)
+    np.divide(rates, 100, out=rates)
+    merged_df[rate_cols] = rates
 
     return merged_df
 
 # --- 4. INSIGHTS STAGE: RANKING & FINAL FILTERING ---
 
+def quick_quantile(values: np.ndarray, q: float) -> float:
+    """Linear-interpolated quantile (same result as Series.quantile) using an O(N) partial sort."""
+    values = values[~np.isnan(values)]
+    if values.size == 0:
+        return np.nan
+
+    position = q * (values.size - 1)
+    lower, upper = int(np.floor(position)), int(np.ceil(position))
+    partitioned = np.partition(values, [lower, upper])
+    return partitioned[lower] + (partitioned[upper] - partitioned[lower]) * (position - lower)
+
+def top_k_positions(values: np.ndarray, k: int) -> np.ndarray:
+    """Positions of the k largest values, largest first (NaN last), using an O(N) partition."""
+    if values.size > k:
+        top = np.argpartition(-values, k - 1)[:k]
+    else:
+        top = np.arange(values.size)
+    return top[np.argsort(-values[top], kind='stable')]
+
 def generate_insights(df):
     """Applies final filtering and creates the final ranked list."""
 
-    final_df = df.copy()
-    
+    # Thresholds and scores are computed in float64 even where the columns are stored as float32
+    mgi = df['MGI'].to_numpy(dtype=np.float64)
+    net_price = df['Net_Price_MidClass'].to_numpy(dtype=np.float64)
+
     # Filter 1: Must have a Net Price for the middle class below a target threshold ($25,000)
-    final_df = final_df[final_df['Net_Price_MidClass'] <= 25000].copy()
-    
     # Filter 2: Must have a competitive MGI (top 50% of the original dataset's MGI)
-    mgi_threshold = df['MGI'].quantile(0.5) 
-    final_df = final_df[final_df['MGI'] >= mgi_threshold].copy()
+    mgi_threshold = quick_quantile(mgi, 0.5) 
+    mask = (net_price <= 25000) & (mgi >= mgi_threshold)
     
     # Ensure minimum 10 colleges are included (if too few, relax the net price filter)
-    if len(final_df) < 10:
-         print(f"Warning: Only {len(final_df)} colleges found. Relaxing Net Price filter to top 20% of MGI.")
-         final_df = df[
-             (df['Net_Price_MidClass'] <= df['Net_Price_MidClass'].quantile(0.3)) & 
-             (df['MGI'] >= df['MGI'].quantile(0.8)) # Target top 20% of MGI
-         ].copy()
+    if np.count_nonzero(mask) < 10:
+         print(f"Warning: Only {np.count_nonzero(mask)} colleges found. Relaxing Net Price filter to top 20% of MGI.")
+         mask = (
+             (net_price <= quick_quantile(net_price, 0.3)) & 
+             (mgi >= quick_quantile(mgi, 0.8)) # Target top 20% of MGI
+         )
+    candidates = np.flatnonzero(mask)
     
     # 4.2 Ranking: Composite Score (MGI and Quality vs. Cost)
-    final_df['Composite_Score'] = (final_df['MGI'] + final_df['Graduation_Rate_4yr']) / final_df['NET_PRICE_RATIO']
-    
-    final_df = final_df.sort_values(by='Composite_Score', ascending=False)
+    # Evaluated in place on a single buffer for the filtered rows only
+    composite_score = mgi[candidates] + df['Graduation_Rate_4yr'].to_numpy(dtype=np.float64)[candidates]
+    composite_score /= df['NET_PRICE_RATIO'].to_numpy(dtype=np.float64)[candidates]
+
+    # Select the top 20 by partial selection instead of sorting every candidate
+    top = top_k_positions(composite_score, 20)
+    final_df = df.iloc[candidates[top]].assign(Composite_Score=composite_score[top])
     
     # Select final columns for the client report
     final_report = final_df[[
         'UNITID', 'INSTNM', 'CONTROL', 'Sticker_Price', 'Avg_Inst_Grant', 
         'Net_Price_MidClass', 'MGI', 'Graduation_Rate_4yr', 'Admissions_Rate', 
         'SATVR75', 'SATMT75', 'Composite_Score', 'MISSION' 
-    ]].head(20).reset_index(drop=True) # Show top 20
+    ]].reset_index(drop=True)
 
     return final_report
 
@@ -191,14 +353,21 @@ def create_visualizations(report_df):
     # --- VISUALIZATION 1: The "Discount Gap" Dumbbell Chart ---
     fig_dumbbell = go.Figure()
 
-    for i in range(len(vis_df)):
-        fig_dumbbell.add_trace(go.Scatter(
-            x=[vis_df['Net_Price_MidClass'][i], vis_df['Sticker_Price'][i]],
-            y=[vis_df['INSTNM'][i], vis_df['INSTNM'][i]],
-            mode='lines',
-            line=dict(color='gray', width=2),
-            showlegend=False
-        ))
+    # All connector lines go in one trace: (net price, sticker price, NaN gap) per college
+    n_colleges = len(vis_df)
+    line_x = np.empty(3 * n_colleges)
+    line_x[0::3] = vis_df['Net_Price_MidClass'].to_numpy()
+    line_x[1::3] = vis_df['Sticker_Price'].to_numpy()
+    line_x[2::3] = np.nan
+    line_y = np.repeat(vis_df['INSTNM'].to_numpy(), 3)
+
+    fig_dumbbell.add_trace(go.Scatter(
+        x=line_x,
+        y=line_y,
+        mode='lines',
+        line=dict(color='gray', width=2),
+        showlegend=False
+    ))
 
     fig_dumbbell.add_trace(go.Scatter(
             x=vis_df['Net_Price_MidClass'],